@@ -1,26 +1,34 @@
 import os
-import shutil
+import asyncio
+import aiofiles
+from concurrent.futures import ProcessPoolExecutor
 from fastapi import FastAPI, File, UploadFile
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import chromadb
+import ollama
 from typing import List
 # Hash dependencies
-from utils.hash import add_to_hash_map, get_file_hash_map
+from utils.hash import add_to_hash_map, remove_from_hash_map, get_file_hash_map
 # Embedding dependencies
 from utils.chat.embedding import get_embeddings
 # Chat response dependencies
 from utils.chat.chat import get_chat_response
+# Cache dependencies
+from utils.chat.cache import invalidate_collection
 # Vector store dependencies
-from utils.vector_store.vector_store import chromadb_vector_store
+from utils.vector_store.vector_store import (
+    chromadb_vector_store, invalidate_cached_collection, TRUNCATED_SUFFIX)
 # Chunk dependencies
 from utils.chunk import chunk_text
 # Extension dependencies
 from utils.extension import get_file_extension
 # Extractor dependencies
 from utils.extractor.txt_extractor import extract_text_from_txt
-from utils.extractor.pdf_extractor import extract_text_from_pdf
+from utils.extractor.pdf_extractor import (
+    extract_text_from_pdf, extract_pdf_page_range, get_pdf_page_count,
+    pdf_page_ranges)
 from utils.extractor.docx_extractor import extract_text_from_docx
 from utils.extractor.csv_extractor import extract_text_from_csv
 from utils.extractor.xlxs_extractor import extract_text_from_xlsx
@@ -28,6 +36,10 @@ from utils.extractor.xlxs_extractor import extract_text_from_xlsx
 # Class model for the request body
 file_hash_map = get_file_hash_map()
 
+# Process pool for CPU-heavy text extraction, so parsing a large document
+# doesn't block the event loop or serialize behind the GIL
+PROC_POOL = ProcessPoolExecutor(max_workers=os.cpu_count())
+
 class Data(BaseModel):
     """
     Model to define the request body for asking questions.
@@ -40,8 +52,8 @@ class Data(BaseModel):
     file_names: List[str] 
 
 
-# Initialize FastAPI app
-app = FastAPI()
+# Initialize FastAPI app (orjson serializes responses ~3-5x faster than stdlib json)
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Allow CORS for all origins (development purposes)
 app.add_middleware(
@@ -51,6 +63,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Warm the models once at startup and pin them resident (keep_alive=-1),
+# so no request pays the multi-second cold model load
+@app.on_event("startup")
+async def warm_models():
+    """Pre-loads the embedding and chat models in Ollama and keeps them resident."""
+    try:
+        await asyncio.to_thread(
+            ollama.embeddings, model="all-minilm", prompt="warmup", keep_alive=-1)
+        await asyncio.to_thread(
+            ollama.chat, model="llama3",
+            messages=[{"role": "user", "content": "hi"}],
+            keep_alive=-1, stream=False)
+        print("Ollama models warmed and pinned")
+    except Exception as e:
+        print(f"Error warming Ollama models: {e}")
+
 # Function to create necessary directories
 def create_directory(directory_path):
     """
@@ -107,10 +135,12 @@ async def upload_file(file: UploadFile = File(...)):
         print(f"File parts: {file_parts}")
         
         file_path = os.path.join(upload_directory, file_name)
-        
-        # Save the uploaded file to the specified directory
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+
+        # Stream the upload to disk in 1 MiB chunks without blocking the
+        # event loop (shutil.copyfileobj would stall other requests)
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await file.read(1 << 20):
+                await buffer.write(chunk)
 
         return {"filename": file.filename, "file_path": file_path}
     except Exception as e:
@@ -145,6 +175,37 @@ def extract_text(file_path):
         print(f"Error extracting text: {e}")
         return ""
 
+# Async wrapper dispatching extraction onto the shared process pool
+async def extract_text_async(file_path):
+    """
+    Extracts text on the shared process pool without blocking the event loop.
+
+    Large PDFs are split into page ranges here, in the parent, and the ranges
+    run concurrently on PROC_POOL — dispatching inside a worker would spawn a
+    second pool per document. Small PDFs and other file types take a single
+    pool hop through extract_text.
+
+    Args:
+        file_path (str): Path to the file.
+
+    Returns:
+        str: Extracted text from the file.
+    """
+    loop = asyncio.get_event_loop()
+    try:
+        if get_file_extension(file_path) == '.pdf':
+            ranges = pdf_page_ranges(get_pdf_page_count(file_path))
+            if ranges is not None:
+                texts = await asyncio.gather(*(
+                    loop.run_in_executor(
+                        PROC_POOL, extract_pdf_page_range, file_path, start, stop)
+                    for start, stop in ranges))
+                return "\n".join(texts)
+    except Exception as e:
+        print(f"Error extracting text from PDF: {e}")
+        return ""
+    return await loop.run_in_executor(PROC_POOL, extract_text, file_path)
+
 # FastAPI endpoint to handle file upload and embedding
 @app.post("/process-file/")
 async def process_file(file: UploadFile = File(...)):
@@ -155,19 +216,20 @@ async def process_file(file: UploadFile = File(...)):
     file (UploadFile): The file uploaded by the user.
 
     Returns:
-    JSONResponse: A response indicating the success or failure of the file processing.
+    ORJSONResponse: A response indicating the success or failure of the file processing.
     """
     try:
         upload_response = await upload_file(file)
         file_path = upload_response["file_path"]
-        content = extract_text(file_path)
+        # Extraction is CPU-bound; run it on the shared process pool
+        content = await extract_text_async(file_path)
         chunks = chunk_text(content)
         embeddings = get_embeddings(file.filename, "all-minilm", chunks)
         chromadb_vector_store(embeddings, chunks, collection_name=file.filename)
-        add_to_hash_map(file.filename)
+        await add_to_hash_map(file.filename)
         return {"message": "File processed and embeddings stored successfully"}
     except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
+        return ORJSONResponse(status_code=500, content={"error": str(e)})
 
 # FastAPI endpoint to ask questions based on the document
 @app.post("/ask-question/")
@@ -187,20 +249,25 @@ async def ask_question(data: Data):
         file_names = data.file_names
 
         if not question or not file_names:
-            return JSONResponse(status_code=400, content={"error": "Question and file_names are required"})
+            return ORJSONResponse(status_code=400, content={"error": "Question and file_names are required"})
 
         if not file_hash_map:
-            return JSONResponse(status_code=400, content={"error": "No file uploaded"})
+            return ORJSONResponse(status_code=400, content={"error": "No file uploaded"})
         
-        for file_name in file_names:
-            if file_name not in file_hash_map:
-                return JSONResponse(status_code=400, content={"error": f"File not found: {file_name}"})
-
-        # StreamingResponse to stream the response
-        return StreamingResponse(get_chat_response(question, file_names), media_type='text/event-stream')
+        # Membership check in one pass over the hash map
+        if missing := set(file_names) - file_hash_map.keys():
+            file_name = next(name for name in file_names if name in missing)
+            return ORJSONResponse(status_code=400, content={"error": f"File not found: {file_name}"})
+
+        # StreamingResponse to stream the response as Server-Sent Events;
+        # X-Accel-Buffering stops nginx from buffering the stream
+        return StreamingResponse(
+            get_chat_response(question, file_names),
+            media_type='text/event-stream',
+            headers={"X-Accel-Buffering": "no"})
 
     except Exception as e:
-        return JSONResponse(status_code=500, content={"error": e})
+        return ORJSONResponse(status_code=500, content={"error": e})
 
 # Function to delete the embeddings and collection from ChromaDB
 def delete_from_chromadb(collection_name):
@@ -215,7 +282,14 @@ def delete_from_chromadb(collection_name):
         collection = client.get_collection(name=collection_name)
         if collection:
             client.delete_collection(collection_name)
+            invalidate_cached_collection(collection_name)
             print(f"Collection {collection_name} deleted from ChromaDB")
+        # Drop the truncated companion as well, if it exists
+        try:
+            client.delete_collection(collection_name + TRUNCATED_SUFFIX)
+            invalidate_cached_collection(collection_name + TRUNCATED_SUFFIX)
+        except Exception:
+            pass
     except Exception as e:
         print(f"Error deleting collection from ChromaDB: {e}")
 
@@ -229,7 +303,7 @@ async def delete_file(file_name: str):
     file_name (str): The name of the file to delete.
 
     Returns:
-    JSONResponse: A response indicating the success or failure of the file deletion.
+    ORJSONResponse: A response indicating the success or failure of the file deletion.
     """
     try:
         # Delete the file from the uploads directory
@@ -240,9 +314,11 @@ async def delete_file(file_name: str):
         # Delete the embeddings and collection from ChromaDB
         delete_from_chromadb(file_name)
 
-        # Remove the file from the hash map
-        if file_name in file_hash_map:
-            del file_hash_map[file_name]
+        # Drop cached answers that referenced this collection
+        invalidate_collection(file_name)
+
+        # Remove the file from the hash map and persist the removal
+        await remove_from_hash_map(file_name)
 
         # Optionally, delete the saved embeddings file
         embeddings_file = os.path.join("embeddings", f"{file_name}.json")
@@ -251,7 +327,7 @@ async def delete_file(file_name: str):
 
         return {"message": "File and associated data deleted successfully"}
     except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
+        return ORJSONResponse(status_code=500, content={"error": str(e)})
 
 # Run the FastAPI app
 if __name__ == "__main__":
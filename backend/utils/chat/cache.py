@@ -0,0 +1,145 @@
+import hashlib
+import threading
+
+from cachetools import LRUCache
+
+# Registry of chunk caches so /delete-file/ can invalidate all of them
+_chunk_caches = []
+
+# Cache for question embeddings, keyed by question digest
+_embedding_lock = threading.Lock()
+_embedding_cache = LRUCache(maxsize=4096)
+
+
+def question_digest(question):
+    """
+    Computes a short digest of a question for use as a cache key.
+
+    Args:
+        question (str): The question text.
+
+    Returns:
+        bytes: A 16-byte blake2b digest of the question.
+    """
+    return hashlib.blake2b(question.encode(), digest_size=16).digest()
+
+
+def get_cached_embedding(digest):
+    """
+    Looks up a cached question embedding.
+
+    Args:
+        digest (bytes): The question digest from question_digest.
+
+    Returns:
+        List[float]: The cached embedding, or None on a miss.
+    """
+    with _embedding_lock:
+        return _embedding_cache.get(digest)
+
+
+def set_cached_embedding(digest, embedding):
+    """
+    Caches a question embedding.
+
+    Args:
+        digest (bytes): The question digest from question_digest.
+        embedding (List[float]): The embedding to cache.
+    """
+    with _embedding_lock:
+        _embedding_cache[digest] = embedding
+
+
+class _IndexedLRUCache(LRUCache):
+    """LRUCache that reports evicted keys so a reverse index can stay in sync."""
+
+    def __init__(self, maxsize, on_evict):
+        super().__init__(maxsize)
+        self._on_evict = on_evict
+
+    def popitem(self):
+        key, value = super().popitem()
+        self._on_evict(key)
+        return key, value
+
+
+class ChunkCache:
+    """
+    LRU cache for combined top-chunk results, keyed by question digest and the
+    set of collections queried.
+
+    A reverse index from collection name to cache keys lets /delete-file/
+    drop every cached result that referenced a deleted collection; entries
+    evicted by the LRU are pruned from the index so it cannot grow without
+    bound.
+    """
+
+    def __init__(self, maxsize=4096):
+        self._lock = threading.Lock()
+        self._cache = _IndexedLRUCache(maxsize, self._drop_from_index)
+        self._by_collection = {}  # collection name -> set of cache keys
+        _chunk_caches.append(self)
+
+    def _drop_from_index(self, key):
+        """Removes an evicted key from the reverse index (called under _lock)."""
+        for collection_name in key[1]:
+            keys = self._by_collection.get(collection_name)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_collection[collection_name]
+
+    def get(self, digest, collections):
+        """
+        Looks up cached top chunks for a question against a set of collections.
+
+        Args:
+            digest (bytes): The question digest from question_digest.
+            collections (List[str]): The collections the question was asked against.
+
+        Returns:
+            The cached result, or None on a miss.
+        """
+        with self._lock:
+            return self._cache.get((digest, tuple(sorted(collections))))
+
+    def set(self, digest, collections, result):
+        """
+        Caches the top chunks for a question against a set of collections.
+
+        Args:
+            digest (bytes): The question digest from question_digest.
+            collections (List[str]): The collections the question was asked against.
+            result: The combined top-chunk result to cache.
+        """
+        key = (digest, tuple(sorted(collections)))
+        with self._lock:
+            self._cache[key] = result
+            for collection_name in key[1]:
+                self._by_collection.setdefault(collection_name, set()).add(key)
+
+    def invalidate(self, collection_name):
+        """
+        Drops every cached result that referenced the given collection.
+
+        Args:
+            collection_name (str): The name of the deleted collection.
+        """
+        with self._lock:
+            for key in self._by_collection.pop(collection_name, ()):
+                self._cache.pop(key, None)
+                # pop() bypasses the eviction hook, so prune the dead key
+                # from the other collections' index sets here
+                self._drop_from_index(key)
+
+
+def invalidate_collection(collection_name):
+    """
+    Invalidates every chunk cache entry referencing a collection, across all
+    chat modules. Called when a file (and its collection) is deleted.
+
+    Args:
+        collection_name (str): The name of the deleted collection.
+    """
+    for cache in _chunk_caches:
+        cache.invalidate(collection_name)
@@ -1,8 +1,16 @@
+import time
 import ollama
-import chromadb
 from typing import List, Generator
 
-def get_chat_response(question, collections: List[str]) -> Generator[str, None, None]:
+from utils.chat import onnx_embedding
+from utils.chat.cache import (
+    ChunkCache, question_digest, get_cached_embedding, set_cached_embedding)
+from utils.vector_store.vector_store import query_with_rerank
+
+# Caches combined top-chunk results for repeated questions
+chunk_cache = ChunkCache()
+
+def get_chat_response(question, collections: List[str]) -> Generator[bytes, None, None]:
     """
     Generate a chat response based on the provided question and document collections.
 
@@ -11,7 +19,7 @@ def get_chat_response(question, collections: List[str]) -> Generator[str, None,
     collections (List[str]): The list of collections to query.
 
     Yields:
-    str: A portion of the chat response.
+    bytes: A pre-encoded Server-Sent Events frame of the chat response.
     """
     try:
         SYSTEM_PROMPT = """You are a helpful reading assistant who answers questions 
@@ -19,19 +27,34 @@ def get_chat_response(question, collections: List[str]) -> Generator[str, None,
         being as concise as possible. If you're unsure, just say that you don't know.
         Context:
     """
-        prompt_embedding = ollama.embeddings(
-            model="all-minilm", prompt=question)["embedding"]
+        # Repeated questions (retries, reloads) skip embedding and retrieval entirely
+        digest = question_digest(question)
+        top_chunks = chunk_cache.get(digest, collections)
+        if top_chunks is None:
+            if (prompt_embedding := get_cached_embedding(digest)) is None:
+                # Embed in-process when an ONNX model is available; otherwise via Ollama
+                if onnx_embedding.is_available():
+                    prompt_embedding = onnx_embedding.embed_batch([question])[0]
+                else:
+                    prompt_embedding = ollama.embeddings(
+                        model="all-minilm", prompt=question, keep_alive=-1)["embedding"]
+                set_cached_embedding(digest, prompt_embedding)
+
+            # Ask each collection for only its share of the final top 7; the
+            # raised hnsw:search_ef set at collection creation preserves recall
+            n_results = max(2, -(-7 // len(collections)))
 
-        # Collect results from all specified collections
-        results_list = []
-        client = chromadb.HttpClient(host='localhost', port=8001)
-        for collection_name in collections:
-            collection = client.get_collection(name=collection_name)
-            results = collection.query(query_embeddings=[prompt_embedding], n_results=5)
-            results_list.append(results)
+            # Collect results from all specified collections (handles are cached,
+            # avoiding a name-resolution round-trip to Chroma per question)
+            results_list = []
+            for collection_name in collections:
+                results = query_with_rerank(
+                    collection_name, prompt_embedding, n_results=n_results)
+                results_list.append(results)
 
-        # Combine results and select the top 5 chunks
-        top_chunks = combine_and_select_top_chunks(results_list)
+            # Combine results and select the top chunks
+            top_chunks = combine_and_select_top_chunks(results_list)
+            chunk_cache.set(digest, collections, top_chunks)
 
         # Generate response based on selected chunks
         response = ollama.chat(
@@ -43,15 +66,31 @@ def get_chat_response(question, collections: List[str]) -> Generator[str, None,
                 },
                 {"role": "user", "content": question},
             ],
-            stream=True
+            stream=True,
+            keep_alive=-1
         )
 
+        # Coalesce tiny tokens into fewer SSE frames: flush once 64 bytes
+        # have accumulated or 50 ms have passed, amortizing per-frame writes.
+        # Payload newlines become extra "data: " lines per the SSE spec, so
+        # paragraph breaks inside a frame don't terminate it early
+        buffer = []
+        buffered = 0
+        last_flush = time.monotonic()
         for chunk in response:
-            # print(chunk["message"]["content"])
-            yield chunk["message"]["content"]
+            content = chunk["message"]["content"]
+            buffer.append(content)
+            buffered += len(content)
+            if buffered >= 64 or time.monotonic() - last_flush > 0.05:
+                yield b"data: " + "".join(buffer).replace("\n", "\ndata: ").encode("utf-8") + b"\n\n"
+                buffer.clear()
+                buffered = 0
+                last_flush = time.monotonic()
+        if buffer:
+            yield b"data: " + "".join(buffer).replace("\n", "\ndata: ").encode("utf-8") + b"\n\n"
     except Exception as e:
         print(f"Error generating chat response: {e}")
-        yield ""
+        yield b""
 
 # Function to combine results and pick top 7 chunks
 def combine_and_select_top_chunks(results_list, top_n=7):
@@ -1,14 +1,100 @@
+import asyncio
+import json
+import time
 import ollama
-import chromadb
-from typing import List, Dict, Generator
+import numpy as np
+from typing import List, Dict, AsyncGenerator
 
-# Initialize ChromaDB client
-client = chromadb.HttpClient(host='localhost', port=8001)
-session_collection = client.get_or_create_collection(name="sessions")
+from cachetools import TTLCache
+
+from utils.chat.embedding import EmbeddingBatcher
+from utils.chat.cache import (
+    ChunkCache, question_digest, get_cached_embedding, set_cached_embedding)
+from utils.vector_store.vector_store import query_with_rerank
+
+try:
+    import redis.asyncio as redis_async
+except ImportError:
+    redis_async = None
+
+# Batches concurrent question embeddings into single Ollama calls
+embedding_batcher = EmbeddingBatcher(model="all-minilm")
+
+# Caches combined top-chunk results for repeated questions
+chunk_cache = ChunkCache()
+
+# Session store: Redis when available, in-process TTL cache otherwise.
+# Sessions are plain chat history, not vector data, so they live outside Chroma.
+SESSION_TTL = 86400  # seconds
+
+redis_client = redis_async.Redis(host='localhost', port=6379) if redis_async else None
+local_sessions = TTLCache(maxsize=4096, ttl=SESSION_TTL)
+
+# Lua script appending one message to a session's JSON history in a single round-trip
+_APPEND_MESSAGE = """
+local history = cjson.decode(redis.call('GET', KEYS[1]) or '[]')
+history[#history + 1] = cjson.decode(ARGV[1])
+redis.call('SET', KEYS[1], cjson.encode(history), 'EX', ARGV[2])
+return #history
+"""
+
+
+async def create_session(session_id: str):
+    """
+    Creates an empty session with a 24 h TTL.
+
+    Parameters:
+    session_id (str): The ID of the session to create.
+    """
+    try:
+        if redis_client is not None:
+            await redis_client.set(f"sess:{session_id}", "[]", ex=SESSION_TTL)
+            return
+    except Exception as e:
+        print(f"Error creating session in Redis: {e}")
+    local_sessions[session_id] = []
+
+
+async def get_session(session_id: str) -> List[Dict]:
+    """
+    Returns the message history for a session.
+
+    Parameters:
+    session_id (str): The ID of the session to fetch.
+
+    Returns:
+    List[Dict]: The session's messages, oldest first.
+    """
+    try:
+        if redis_client is not None:
+            history = await redis_client.get(f"sess:{session_id}")
+            return json.loads(history) if history else []
+    except Exception as e:
+        print(f"Error fetching session from Redis: {e}")
+    return list(local_sessions.get(session_id, []))
+
+
+async def update_session(session_id: str, message: Dict):
+    """
+    Appends one message to a session's history in a single round-trip.
+
+    Parameters:
+    session_id (str): The ID of the session to update.
+    message (Dict): The message to append, e.g. {"role": "user", "content": ...}.
+    """
+    try:
+        if redis_client is not None:
+            await redis_client.eval(
+                _APPEND_MESSAGE, 1, f"sess:{session_id}",
+                json.dumps(message), SESSION_TTL)
+            return
+    except Exception as e:
+        print(f"Error updating session in Redis: {e}")
+    local_sessions.setdefault(session_id, []).append(message)
 
 
 # Generate chat response with session management
-def get_chat_response(question: str, collections: List[str], session_id: str) -> Generator[str, None, None]:
+async def get_chat_response(question: str, collections: List[str], session_id: str) -> AsyncGenerator[bytes, None]:
     """
     Generate a chat response based on the provided question, document collections, and session ID.
 
@@ -18,31 +104,43 @@ def get_chat_response(question: str, collections: List[str], session_id: str) ->
     session_id (str): The ID of the current session.
 
     Yields:
-    str: A portion of the chat response.
+    bytes: A pre-encoded Server-Sent Events frame of the chat response.
     """
     try:
-        SYSTEM_PROMPT = """You are a helpful reading assistant who answers questions 
-        based on snippets of text provided in context. Answer only using the context provided, 
+        SYSTEM_PROMPT = """You are a helpful reading assistant who answers questions
+        based on snippets of text provided in context. Answer only using the context provided,
         being as concise as possible. If you're unsure, just say that you don't know.
         Context:
     """
-        prompt_embedding = ollama.embeddings(
-            model="all-minilm", prompt=question)["embedding"]
+        # Repeated questions (retries, reloads) skip embedding and retrieval entirely
+        digest = question_digest(question)
+        top_chunks = chunk_cache.get(digest, collections)
+        if top_chunks is None:
+            if (prompt_embedding := get_cached_embedding(digest)) is None:
+                prompt_embedding = await embedding_batcher.embed(question)
+                set_cached_embedding(digest, prompt_embedding)
+
+            # Query all specified collections concurrently; each query is a network
+            # round-trip to Chroma, so latency stays flat as files are added
+            # Ask each collection for only its share of the final top 7; the
+            # raised hnsw:search_ef set at collection creation preserves recall
+            k_per_collection = max(2, -(-7 // len(collections)))
+
+            def query_collection(collection_name):
+                return query_with_rerank(
+                    collection_name, prompt_embedding, n_results=k_per_collection)
 
-        # Collect results from all specified collections
-        results_list = []
-        for collection_name in collections:
-            collection = client.get_collection(name=collection_name)
-            results = collection.query(query_embeddings=[prompt_embedding], n_results=5)
-            results_list.append(results)
+            results_list = await asyncio.gather(
+                *[asyncio.to_thread(query_collection, name) for name in collections])
+
+            # Combine results and select the top chunks
+            top_chunks = combine_and_select_top_chunks(results_list)
+            chunk_cache.set(digest, collections, top_chunks)
 
-        # Combine results and select the top chunks
-        top_chunks = combine_and_select_top_chunks(results_list)
 
-        
 
         # Generate response based on selected chunks
-        response = ollama.chat(
+        response = await ollama.AsyncClient().chat(
             model="llama3",
             messages=[
                 {
@@ -51,15 +149,37 @@ def get_chat_response(question: str, collections: List[str], session_id: str) ->
                 },
                 {"role": "user", "content": question},
             ],
-            stream=True
+            stream=True,
+            keep_alive=-1
         )
 
-        for chunk in response:
-            # Update session with the assistant's response
-            yield chunk["message"]["content"]
+        # Coalesce tiny tokens into fewer SSE frames: flush once 64 bytes
+        # have accumulated or 50 ms have passed, amortizing per-frame writes.
+        # Payload newlines become extra "data: " lines per the SSE spec, so
+        # paragraph breaks inside a frame don't terminate it early
+        answer = ""
+        buffer = []
+        buffered = 0
+        last_flush = time.monotonic()
+        async for chunk in response:
+            content = chunk["message"]["content"]
+            answer += content
+            buffer.append(content)
+            buffered += len(content)
+            if buffered >= 64 or time.monotonic() - last_flush > 0.05:
+                yield b"data: " + "".join(buffer).replace("\n", "\ndata: ").encode("utf-8") + b"\n\n"
+                buffer.clear()
+                buffered = 0
+                last_flush = time.monotonic()
+        if buffer:
+            yield b"data: " + "".join(buffer).replace("\n", "\ndata: ").encode("utf-8") + b"\n\n"
+
+        # Record the turn in the session once the response is complete
+        await update_session(session_id, {"role": "user", "content": question})
+        await update_session(session_id, {"role": "assistant", "content": answer})
     except Exception as e:
         print(f"Error generating chat response: {e}")
-        yield ""
+        yield b""
 
 # Function to combine results and pick top chunks
 def combine_and_select_top_chunks(results_list, top_n=7):
@@ -74,18 +194,22 @@ def combine_and_select_top_chunks(results_list, top_n=7):
     List[str]: The top N chunks of text.
     """
     try:
-        combined_results = []
-        for result in results_list:
-            distances = result.get("distances", [])[0]
-            documents = result.get("documents", [])[0]
-            combined_results.extend(zip(distances, documents))
-        
-        # Sort combined results by distance (similarity score)
-        combined_results.sort(key=lambda x: x[0])
-        
-        # Select top N results
-        top_chunks = [doc for _, doc in combined_results[:top_n]]
-        return top_chunks
+        # Stack distances and documents into parallel arrays
+        distances = np.concatenate([
+            np.asarray(result.get("distances", [[]])[0], dtype=np.float32)
+            for result in results_list])
+        documents = np.concatenate([
+            np.asarray(result.get("documents", [[]])[0], dtype=object)
+            for result in results_list])
+
+        if len(distances) == 0:
+            return []
+
+        # Partial-select the top N by distance, then sort only those N
+        top_n = min(top_n, len(distances))
+        idx = np.argpartition(distances, top_n - 1)[:top_n]
+        idx = idx[np.argsort(distances[idx])]
+        return documents[idx].tolist()
     except Exception as e:
         print(f"Error combining and selecting top chunks: {e}")
         return []
@@ -1,59 +1,88 @@
-import json
+import asyncio
+import hashlib
+import time
 import ollama
-import chromadb
-from typing import List, Generator, Tuple
+import orjson
+import numpy as np
+from typing import List, AsyncGenerator, Tuple
+
+from utils.chat.embedding import EmbeddingBatcher
+from utils.chat.cache import (
+    ChunkCache, question_digest, get_cached_embedding, set_cached_embedding)
+from utils.vector_store.vector_store import query_with_rerank
 
 # In-memory list to store the conversation history
 message_history = []
 
-def load_message_history(file_path="message_history.json"):
+HISTORY_FILE = "message_history.jsonl"
+
+# Digests of stored (question, response) pairs for O(1) duplicate checks
+_seen = set()
+
+def _history_digest(question: str, response: str) -> bytes:
+    """Returns a short digest identifying a (question, response) pair."""
+    return hashlib.blake2b(
+        (question + "\x00" + response).encode(), digest_size=16).digest()
+
+def load_message_history(file_path=HISTORY_FILE):
     """
-    Loads the conversation history from a JSON file.
+    Loads the conversation history from a JSONL file, one entry per line.
 
     Args:
-        file_path (str): The path to the JSON file containing the message history.
+        file_path (str): The path to the JSONL file containing the message history.
     """
+    global message_history
     try:
-        with open(file_path, 'r') as file:
-            global message_history
-            message_history = json.load(file)
+        with open(file_path, 'rb') as file:
+            message_history = [orjson.loads(line) for line in file if line.strip()]
     except FileNotFoundError:
         message_history = []
-
-def save_message_history(file_path="message_history.json"):
-    """
-    Saves the conversation history to a JSON file.
-
-    Args:
-        file_path (str): The path to the JSON file where the message history will be saved.
-    """
-    with open(file_path, 'w') as file:
-        json.dump(message_history, file, indent=4)
+    _seen.clear()
+    _seen.update(
+        _history_digest(entry["question"], entry["response"])
+        for entry in message_history)
 
 def store_message_history(question: str, response: str, file_name: str):
     """
-    Stores the question, response, and file name in the conversation history and saves it.
+    Stores the question, response, and file name in the conversation history
+    and appends it to the JSONL file.
+
+    Each turn is an O(1) append to the file instead of rewriting the full
+    history with an indented JSON dump.
 
     Args:
         question (str): The user's question.
         response (str): The generated response.
         file_name (str): The name of the file where the response was found.
     """
-    # Check if the question already exists in the message history
-    if any(entry["question"] == question and entry["response"] == response for entry in message_history):
+    # Check the digest set instead of scanning the whole history
+    digest = _history_digest(question, response)
+    if digest in _seen:
         return  # Avoid duplicates
-    
-    message_history.append({
+    _seen.add(digest)
+
+    entry = {
         "file_name": file_name,
         "question": question,
         "response": response
-    })
-    save_message_history()
+    }
+    message_history.append(entry)
+    try:
+        with open(HISTORY_FILE, "ab") as file:
+            file.write(orjson.dumps(entry) + b"\n")
+    except Exception as e:
+        print(f"Error saving message history: {e}")
 
 # Load existing message history at the start of the program
 load_message_history()
 
-def get_chat_response(question, collections: List[str]) -> Generator[str, None, None]:
+# Batches concurrent question embeddings into single Ollama calls
+embedding_batcher = EmbeddingBatcher(model="all-minilm")
+
+# Caches combined top-chunk results for repeated questions
+chunk_cache = ChunkCache()
+
+async def get_chat_response(question, collections: List[str]) -> AsyncGenerator[bytes, None]:
     """
     Generate a chat response based on the provided question and document collections.
     Tracks the conversation history.
@@ -63,7 +92,7 @@ def get_chat_response(question, collections: List[str]) -> Generator[str, None,
     collections (List[str]): The list of collections to query.
 
     Yields:
-    str: A portion of the chat response.
+    bytes: A pre-encoded Server-Sent Events frame of the chat response.
     """
     try:
         SYSTEM_PROMPT = """You are a helpful reading assistant who answers questions 
@@ -72,23 +101,37 @@ def get_chat_response(question, collections: List[str]) -> Generator[str, None,
         Context:
         """
         
-        # Generate MiniLM embeddings for the question
-        prompt_embedding = ollama.embeddings(
-            model="all-minilm", prompt=question)["embedding"]
-
-        # Initialize ChromaDB client and collect results from all specified collections
-        client = chromadb.HttpClient(host='localhost', port=8001)
-        results_list = []
-        for collection_name in collections:
-            collection = client.get_collection(name=collection_name)
-            results = collection.query(query_embeddings=[prompt_embedding], n_results=5)
-            results_list.append({"collection_name": collection_name, "results": results})
-
-        # Combine results and select the top 7 chunks
-        top_chunks, file_names = combine_and_select_top_chunks(results_list, top_n=7)
+        # Repeated questions (retries, reloads) skip embedding and retrieval entirely
+        digest = question_digest(question)
+        cached = chunk_cache.get(digest, collections)
+        if cached is not None:
+            top_chunks, file_names = cached
+        else:
+            # Generate MiniLM embeddings for the question (micro-batched)
+            if (prompt_embedding := get_cached_embedding(digest)) is None:
+                prompt_embedding = await embedding_batcher.embed(question)
+                set_cached_embedding(digest, prompt_embedding)
+
+            # Query all specified collections concurrently; handles are cached,
+            # so only the queries themselves hit Chroma
+            # Ask each collection for only its share of the final top 7; the
+            # raised hnsw:search_ef set at collection creation preserves recall
+            k_per_collection = max(2, -(-7 // len(collections)))
+
+            def query_collection(collection_name):
+                results = query_with_rerank(
+                    collection_name, prompt_embedding, n_results=k_per_collection)
+                return {"collection_name": collection_name, "results": results}
+
+            results_list = await asyncio.gather(
+                *[asyncio.to_thread(query_collection, name) for name in collections])
+
+            # Combine results and select the top 7 chunks
+            top_chunks, file_names = combine_and_select_top_chunks(results_list, top_n=7)
+            chunk_cache.set(digest, collections, (top_chunks, file_names))
 
         # Generate a response based on the selected chunks
-        response_generator = ollama.chat(
+        response_generator = await ollama.AsyncClient().chat(
             model="llama3.1",
             messages=[
                 {
@@ -97,14 +140,30 @@ def get_chat_response(question, collections: List[str]) -> Generator[str, None,
                 },
                 {"role": "user", "content": question},
             ],
-            stream=True
+            stream=True,
+            keep_alive=-1
         )
 
+        # Coalesce tiny tokens into fewer SSE frames: flush once 64 bytes
+        # have accumulated or 50 ms have passed, amortizing per-frame writes.
+        # Payload newlines become extra "data: " lines per the SSE spec, so
+        # paragraph breaks inside a frame don't terminate it early
         response = ""
-        for chunk in response_generator:
+        buffer = []
+        buffered = 0
+        last_flush = time.monotonic()
+        async for chunk in response_generator:
             content = chunk["message"]["content"]
             response += content
-            yield content
+            buffer.append(content)
+            buffered += len(content)
+            if buffered >= 64 or time.monotonic() - last_flush > 0.05:
+                yield b"data: " + "".join(buffer).replace("\n", "\ndata: ").encode("utf-8") + b"\n\n"
+                buffer.clear()
+                buffered = 0
+                last_flush = time.monotonic()
+        if buffer:
+            yield b"data: " + "".join(buffer).replace("\n", "\ndata: ").encode("utf-8") + b"\n\n"
 
         # Store the question, response, and associated file name once
         if file_names:
@@ -112,7 +171,7 @@ def get_chat_response(question, collections: List[str]) -> Generator[str, None,
 
     except Exception as e:
         print(f"Error generating chat response: {e}")
-        yield ""
+        yield b""
 
 def combine_and_select_top_chunks(results_list, top_n=7) -> Tuple[List[str], List[str]]:
     """
@@ -126,21 +185,26 @@ def combine_and_select_top_chunks(results_list, top_n=7) -> Tuple[List[str], Lis
     Tuple[List[str], List[str]]: The top N chunks of text and their corresponding file names.
     """
     try:
-        combined_results = []
-        file_names = []
-        for result in results_list:
-            distances = result["results"].get("distances", [])[0]
-            documents = result["results"].get("documents", [])[0]
-            collection_name = result["collection_name"]
-            combined_results.extend(zip(distances, documents, [collection_name]*len(documents)))
-        
-        # Sort combined results by distance (similarity score)
-        combined_results.sort(key=lambda x: x[0])
-        
-        # Select top N results
-        top_chunks = [doc for _, doc, _ in combined_results[:top_n]]
-        file_names = [file_name for _, _, file_name in combined_results[:top_n]]
-        return top_chunks, file_names
+        # Stack distances, documents and collection names into parallel arrays
+        distances = np.concatenate([
+            np.asarray(result["results"].get("distances", [[]])[0], dtype=np.float32)
+            for result in results_list])
+        documents = np.concatenate([
+            np.asarray(result["results"].get("documents", [[]])[0], dtype=object)
+            for result in results_list])
+        collection_names = np.concatenate([
+            np.full(len(result["results"].get("documents", [[]])[0]),
+                    result["collection_name"], dtype=object)
+            for result in results_list])
+
+        if len(distances) == 0:
+            return [], []
+
+        # Partial-select the top N by distance, then sort only those N
+        top_n = min(top_n, len(distances))
+        idx = np.argpartition(distances, top_n - 1)[:top_n]
+        idx = idx[np.argsort(distances[idx])]
+        return documents[idx].tolist(), collection_names[idx].tolist()
     except Exception as e:
         print(f"Error combining and selecting top chunks: {e}")
         return [], []
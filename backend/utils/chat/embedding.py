@@ -1,7 +1,10 @@
 import ollama
+import asyncio
 import json
 import os
 
+from utils.chat import onnx_embedding
+
 # Load and save embeddings using JSON files
 def save_embeddings(filename, embeddings):
     """
@@ -55,12 +58,84 @@ def get_embeddings(filename, modelname, chunks):
     try:
         if (embeddings := load_embeddings(filename)) is not False:
             return embeddings
-        embeddings = [
-            ollama.embeddings(model=modelname, prompt=chunk)["embedding"]
-            for chunk in chunks
-        ]
+        # Send every chunk in one batched request instead of one HTTP call
+        # per chunk; num_batch lets Ollama fill its internal batch.
+        embeddings = ollama.embed(
+            model=modelname, input=list(chunks), options={"num_batch": 512},
+            keep_alive=-1
+        )["embeddings"]
         save_embeddings(filename, embeddings)
         return embeddings
     except Exception as e:
         print(f"Error getting embeddings: {e}")
         return []
+
+
+# Micro-batching worker for single-prompt embedding requests
+class EmbeddingBatcher:
+    """
+    Collects concurrent single-prompt embedding requests and issues them to
+    Ollama as one batched call.
+
+    Callers await `embed(prompt)`; a background task drains the queue for a
+    short window (default 10 ms, up to `max_batch` prompts) and resolves every
+    pending future from a single `/api/embed` request, amortizing the per-call
+    HTTP and JSON overhead.
+    """
+
+    def __init__(self, model="all-minilm", max_batch=32, window=0.01):
+        self.model = model
+        self.max_batch = max_batch
+        self.window = window
+        self._queue = asyncio.Queue()
+        self._pending = {}  # prompt -> Future, dedupes identical prompts
+        self._client = ollama.AsyncClient()
+        self._worker = None
+
+    async def embed(self, prompt):
+        """
+        Get the embedding for a single prompt, batched with any concurrent requests.
+
+        Parameters:
+        prompt (str): The text to embed.
+
+        Returns:
+        List[float]: The embedding for the prompt.
+        """
+        if (future := self._pending.get(prompt)) is not None:
+            return await future
+        future = asyncio.get_running_loop().create_future()
+        self._pending[prompt] = future
+        await self._queue.put(prompt)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        return await future
+
+    async def _run(self):
+        """Background task: drain the queue in micro-batches and resolve futures."""
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self._queue.get(), timeout=self.window))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                # Embed in-process when an ONNX model is available, skipping
+                # the localhost HTTP round-trip to Ollama entirely
+                if onnx_embedding.is_available():
+                    embeddings = await asyncio.to_thread(
+                        onnx_embedding.embed_batch, batch)
+                else:
+                    response = await self._client.embed(
+                        model=self.model, input=batch, keep_alive=-1)
+                    embeddings = response["embeddings"]
+                for prompt, embedding in zip(batch, embeddings):
+                    if (future := self._pending.pop(prompt, None)) is not None:
+                        future.set_result(embedding)
+            except Exception as e:
+                print(f"Error embedding batch: {e}")
+                for prompt in batch:
+                    if (future := self._pending.pop(prompt, None)) is not None:
+                        future.set_exception(e)
@@ -0,0 +1,70 @@
+"""
+In-process embedding with ONNX Runtime.
+
+Each Ollama embedding call pays localhost HTTP + JSON framing on top of the
+actual inference, which dominates for short queries. When an exported ONNX
+copy of the embedding model is present (e.g. via
+`optimum-cli export onnx -m sentence-transformers/all-MiniLM-L6-v2 <dir>`,
+optionally int8-quantized with ORTQuantizer), embeddings run in-process
+instead. If onnxruntime/transformers or the model directory are missing,
+callers fall back to Ollama.
+"""
+import os
+
+import numpy as np
+
+try:
+    import onnxruntime
+    from transformers import AutoTokenizer
+except ImportError:
+    onnxruntime = None
+    AutoTokenizer = None
+
+# Directory holding model.onnx plus the tokenizer files
+MODEL_DIR = os.environ.get("ONNX_EMBED_MODEL_DIR", os.path.join("models", "all-minilm-onnx"))
+
+_session = None
+_tokenizer = None
+
+
+def is_available():
+    """Returns True when the ONNX runtime and an exported model are present."""
+    return (onnxruntime is not None
+            and os.path.exists(os.path.join(MODEL_DIR, "model.onnx")))
+
+
+def _get_session():
+    """Lazily creates the shared InferenceSession and tokenizer."""
+    global _session, _tokenizer
+    if _session is None:
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = os.cpu_count() or 1
+        _session = onnxruntime.InferenceSession(
+            os.path.join(MODEL_DIR, "model.onnx"),
+            sess_options=options,
+            providers=["CPUExecutionProvider"])
+        _tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
+    return _session, _tokenizer
+
+
+def embed_batch(texts):
+    """
+    Embeds a batch of texts in-process with mean pooling and L2 normalization.
+
+    Parameters:
+    texts (List[str]): The texts to embed.
+
+    Returns:
+    List[List[float]]: One embedding per input text.
+    """
+    session, tokenizer = _get_session()
+    encoded = tokenizer(list(texts), return_tensors="np", padding=True, truncation=True)
+    inputs = {name.name: encoded[name.name]
+              for name in session.get_inputs() if name.name in encoded}
+    hidden = session.run(None, inputs)[0]
+
+    # Mean-pool token embeddings over the attention mask, then L2 normalize
+    mask = encoded["attention_mask"][..., None].astype(np.float32)
+    pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+    pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-9, None)
+    return pooled.tolist()
@@ -1,9 +1,96 @@
-from langchain_community.document_loaders import PyPDFLoader
+import pypdfium2 as pdfium
+
+# Page-count thresholds routing a PDF to an extraction strategy. Kept as data
+# so they can be tuned without touching the extraction code: tiny documents
+# aren't worth parallel fan-out, everything larger is split into contiguous
+# page ranges — small ranges for mid-sized documents, big ranges for huge
+# ones. The fan-out itself happens in the caller (backend.py feeds the ranges
+# from pdf_page_ranges to its single shared process pool); this module only
+# plans ranges and extracts one range per call, so no worker ever spawns a
+# pool of its own. PDFium is NOT thread-safe, even across separate documents
+# (at most one thread may call into pdfium per process), so parallel ranges
+# must run in separate processes.
+PARSER_RULES = {
+    "sequential_max_pages": 7,
+    "small_chunk_max_pages": 200,
+    "small_chunk_pages": 32,
+    "large_chunk_pages": 200,
+}
+
+
+def get_pdf_page_count(pdf_path):
+    """
+    Returns the number of pages in a PDF; cheap enough for the request path.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+
+    Returns:
+        int: The page count.
+    """
+    doc = pdfium.PdfDocument(pdf_path)
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+
+def pdf_page_ranges(n_pages):
+    """
+    Plans the page ranges for parallel extraction based on PARSER_RULES.
+
+    Args:
+        n_pages (int): Total number of pages in the PDF.
+
+    Returns:
+        List[Tuple[int, int]]: (start, stop) ranges to extract in parallel,
+        or None when the document is small enough to extract sequentially.
+    """
+    if n_pages <= PARSER_RULES["sequential_max_pages"]:
+        return None
+    if n_pages <= PARSER_RULES["small_chunk_max_pages"]:
+        chunk_pages = PARSER_RULES["small_chunk_pages"]
+    else:
+        chunk_pages = PARSER_RULES["large_chunk_pages"]
+    return [(start, min(start + chunk_pages, n_pages))
+            for start in range(0, n_pages, chunk_pages)]
+
+
+def extract_pdf_page_range(pdf_path, start, stop):
+    """
+    Extracts text from a contiguous range of pages, opening the document
+    independently so the range can run in any process.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        start (int): First page index (inclusive).
+        stop (int): Last page index (exclusive).
+
+    Returns:
+        str: Extracted text for the page range.
+    """
+    doc = pdfium.PdfDocument(pdf_path)
+    try:
+        texts = []
+        # Free each page's textpage as soon as it is read to keep memory flat
+        for index in range(start, stop):
+            page = doc[index]
+            textpage = page.get_textpage()
+            texts.append(textpage.get_text_range())
+            textpage.close()
+            page.close()
+        return "\n".join(texts)
+    finally:
+        doc.close()
+
 
 # Function to extract text from a PDF file
 def extract_text_from_pdf(pdf_path):
     """
-    Extracts text from a PDF file.
+    Extracts text from a PDF file sequentially in the current process.
+
+    Callers that want parallelism fan the ranges from pdf_page_ranges out
+    over their own process pool instead of calling this.
 
     Args:
         pdf_path (str): Path to the PDF file.
@@ -12,10 +99,7 @@ def extract_text_from_pdf(pdf_path):
         str: Extracted text from the PDF file.
     """
     try:
-        loader = PyPDFLoader(pdf_path)
-        pages = loader.load_and_split()
-        text = "\n".join(page.page_content for page in pages)
-        return text
+        return extract_pdf_page_range(pdf_path, 0, get_pdf_page_count(pdf_path))
     except Exception as e:
         print(f"Error extracting text from PDF: {e}")
-        return ""
\ No newline at end of file
+        return ""
@@ -1,25 +1,67 @@
+import asyncio
 import hashlib
+import json
+import os
 
-file_hash_map = {}
+import aiofiles
 
-def get_file_hash_map(): 
+HASH_MAP_FILE = "file_hash_map.json"
+
+def _load_file_hash_map():
+    """Loads the persisted hash map from disk once at startup."""
+    try:
+        if os.path.exists(HASH_MAP_FILE):
+            with open(HASH_MAP_FILE, "r") as f:
+                return json.load(f)
+    except Exception as e:
+        print(f"Error loading file hash map: {e}")
+    return {}
+
+# Hash map to keep track of file metadata; loaded once and updated in memory,
+# so request handlers never touch the disk for membership checks
+file_hash_map = _load_file_hash_map()
+_hash_map_lock = asyncio.Lock()
+
+def get_file_hash_map():
     # Hash map to keep track of file metadata
     return file_hash_map
 
 # Add file metadata to the hash map
-def add_to_hash_map(file_name):
+async def add_to_hash_map(file_name):
     """
-    Adds file metadata to the hash map by generating a hash.
+    Adds file metadata to the hash map by generating a hash, then persists the
+    map to disk without blocking the event loop.
 
     Args:
         file_name (str): The name of the file.
     """
     try:
-        file_hash_map[str(file_name)] = generate_hash(file_name)
+        async with _hash_map_lock:
+            file_hash_map[str(file_name)] = generate_hash(file_name)
+            async with aiofiles.open(HASH_MAP_FILE, "w") as f:
+                await f.write(json.dumps(file_hash_map))
     except Exception as e:
         print(f"Error adding to hash map: {e}")
 
 
+# Remove file metadata from the hash map
+async def remove_from_hash_map(file_name):
+    """
+    Removes a file from the hash map and persists the change to disk, so
+    deleted files stay deleted across restarts.
+
+    Args:
+        file_name (str): The name of the file.
+    """
+    try:
+        async with _hash_map_lock:
+            file_hash_map.pop(str(file_name), None)
+            async with aiofiles.open(HASH_MAP_FILE, "w") as f:
+                await f.write(json.dumps(file_hash_map))
+    except Exception as e:
+        print(f"Error removing from hash map: {e}")
+
+
 # Generate a hash from an input string
 def generate_hash(input_string):
     """
@@ -37,4 +79,3 @@ def generate_hash(input_string):
     except Exception as e:
         print(f"Error generating hash: {e}")
         return ""
-
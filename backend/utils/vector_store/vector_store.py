@@ -1,4 +1,115 @@
 import chromadb
+import numpy as np
+
+# Matryoshka-style truncated index: HNSW runs over normalized prefixes of the
+# embeddings (a third of the memory bandwidth at 128 of 384 dims), and the
+# full vectors in the main collection are only touched for an exact re-rank
+# of a small shortlist
+TRUNCATED_DIM = 128
+TRUNCATED_SUFFIX = "__trunc128"
+RERANK_SHORTLIST = 20
+
+# Tuned HNSW parameters, applied to the main collection AND the truncated
+# companion: the companion is the index ANN queries actually search, so the
+# raised search_ef that the per-collection n_results reduction in the chat
+# modules relies on must be set there too; M/construction_ef trade index
+# build time for a better graph
+_HNSW_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:search_ef": 128,
+    "hnsw:construction_ef": 200,
+    "hnsw:M": 32,
+}
+
+# Cache of collection handles; resolving a name to a collection is an HTTP
+# round-trip to Chroma, so handles are fetched once and reused
+_client = None
+_collection_cache = {}
+
+def _get_client():
+    """Returns a lazily created, shared ChromaDB client."""
+    global _client
+    if _client is None:
+        _client = chromadb.HttpClient(host='localhost', port=8001)  # ChromaDB port
+    return _client
+
+def get_cached_collection(collection_name):
+    """
+    Returns a collection handle, resolving it via Chroma only on first use.
+
+    Args:
+        collection_name (str): Name of the ChromaDB collection.
+
+    Returns:
+        chromadb.Collection: The cached collection handle.
+    """
+    collection = _collection_cache.get(collection_name)
+    if collection is None:
+        collection = _get_client().get_collection(name=collection_name)
+        _collection_cache[collection_name] = collection
+    return collection
+
+def invalidate_cached_collection(collection_name):
+    """
+    Drops a collection handle from the cache, e.g. after the collection is deleted.
+
+    Args:
+        collection_name (str): Name of the ChromaDB collection.
+    """
+    _collection_cache.pop(collection_name, None)
+
+def _truncate_normalized(embeddings):
+    """Truncates embeddings to TRUNCATED_DIM and L2-normalizes each row."""
+    v = np.asarray(embeddings, dtype=np.float32)[:, :TRUNCATED_DIM]
+    return v / np.clip(np.linalg.norm(v, axis=1, keepdims=True), 1e-9, None)
+
+def query_with_rerank(collection_name, query_embedding, n_results=7):
+    """
+    Queries a collection via its truncated index, then re-ranks by exact
+    cosine against the full vectors.
+
+    Falls back to a plain query on the main collection when the truncated
+    companion does not exist (collections ingested before it was introduced).
+
+    Args:
+        collection_name (str): Name of the ChromaDB collection.
+        query_embedding (List[float]): The full-precision query embedding.
+        n_results (int): Number of results to return after re-ranking.
+
+    Returns:
+        dict: Query results with "ids", "documents" and "distances" lists,
+        shaped like chromadb.Collection.query output.
+    """
+    try:
+        truncated = get_cached_collection(collection_name + TRUNCATED_SUFFIX)
+    except Exception:
+        return get_cached_collection(collection_name).query(
+            query_embeddings=[query_embedding], n_results=n_results)
+
+    query = np.asarray(query_embedding, dtype=np.float32)
+    truncated_query = _truncate_normalized([query])[0]
+    shortlist = truncated.query(
+        query_embeddings=[truncated_query.tolist()], n_results=RERANK_SHORTLIST)
+    ids = shortlist["ids"][0]
+    if not ids:
+        return {"ids": [[]], "documents": [[]], "distances": [[]]}
+
+    # One get() pulls the shortlist's full vectors for exact cosine re-ranking
+    full = get_cached_collection(collection_name).get(
+        ids=ids, include=["embeddings", "documents"])
+    vectors = np.asarray(full["embeddings"], dtype=np.float32)
+    similarities = vectors @ query / np.clip(
+        np.linalg.norm(vectors, axis=1) * np.linalg.norm(query), 1e-9, None)
+    distances = 1.0 - similarities
+
+    n_results = min(n_results, len(distances))
+    idx = np.argpartition(distances, n_results - 1)[:n_results]
+    idx = idx[np.argsort(distances[idx])]
+    return {
+        "ids": [[full["ids"][i] for i in idx]],
+        "documents": [[full["documents"][i] for i in idx]],
+        "distances": [distances[idx].tolist()],
+    }
 
 # Store embeddings in ChromaDB
 def chromadb_vector_store(embeddings, paragraphs, collection_name):
@@ -14,9 +125,11 @@ def chromadb_vector_store(embeddings, paragraphs, collection_name):
         chromadb.Collection: The collection where embeddings are stored.
     """
     try:
-        client = chromadb.HttpClient(host='localhost', port=8001)  # ChromaDB port
+        client = _get_client()
         collection = client.get_or_create_collection(
-            name=collection_name, metadata={"hnsw:space": "cosine"})
+            name=collection_name,
+            metadata=dict(_HNSW_METADATA))
+        _collection_cache[collection_name] = collection
 
         # Add embeddings to the collection
         n = len(paragraphs)
@@ -27,6 +140,17 @@ def chromadb_vector_store(embeddings, paragraphs, collection_name):
             metadatas=[{"doc_id": i} for i in range(n)],
         )
 
+        # Secondary collection holding normalized 128-dim prefixes; queries
+        # search this one and re-rank against the full vectors above, so it
+        # gets the same tuned HNSW parameters
+        truncated = client.get_or_create_collection(
+            name=collection_name + TRUNCATED_SUFFIX,
+            metadata=dict(_HNSW_METADATA))
+        truncated.add(
+            ids=[str(id) for id in range(n)],
+            embeddings=_truncate_normalized(embeddings).tolist(),
+        )
+
         print("Stored embeddings in ChromaDB collection")
         return collection
     except Exception as e:
@@ -42,11 +166,18 @@ def delete_from_chromadb(collection_name):
     collection_name (str): The name of the collection to delete.
     """
     try:
-        client = chromadb.HttpClient(host='localhost', port=8001)  # ChromaDB port
+        client = _get_client()
         collection = client.get_collection(name=collection_name)
         if collection:
             client.delete_collection(collection_name)
+            invalidate_cached_collection(collection_name)
             print(f"Collection {collection_name} deleted from ChromaDB")
+        # Drop the truncated companion as well, if it exists
+        try:
+            client.delete_collection(collection_name + TRUNCATED_SUFFIX)
+            invalidate_cached_collection(collection_name + TRUNCATED_SUFFIX)
+        except Exception:
+            pass
     except Exception as e:
         print(f"Error deleting collection from ChromaDB: {e}")
 
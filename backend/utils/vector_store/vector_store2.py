@@ -1,50 +1,127 @@
 import sqlite3
 
+import numpy as np
+
+def _connect():
+    """Open a connection to the embeddings database with fast-write PRAGMAs set."""
+    conn = sqlite3.connect('embeddings.db')
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
 def init_db():
     """Initialize the SQLite database and create necessary tables."""
-    conn = sqlite3.connect('embeddings.db')
+    conn = _connect()
     c = conn.cursor()
 
-    # Create tables for embeddings
+    # Create tables for embeddings (embedding is int8-quantized, see quantize_int8)
     c.execute('''
     CREATE TABLE IF NOT EXISTS embeddings (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         collection_name TEXT NOT NULL,
         doc_id INTEGER NOT NULL,
         embedding BLOB NOT NULL,
+        scale REAL NOT NULL,
         paragraph TEXT NOT NULL
     )
     ''')
+    # Migrate databases created before quantization: add the scale column so
+    # inserts don't fail against the old schema (legacy rows keep scale 1.0)
+    columns = [row[1] for row in c.execute('PRAGMA table_info(embeddings)')]
+    if 'scale' not in columns:
+        c.execute('ALTER TABLE embeddings ADD COLUMN scale REAL NOT NULL DEFAULT 1.0')
+    # Index so per-collection deletes and lookups seek instead of full-scanning
+    c.execute('''
+    CREATE INDEX IF NOT EXISTS idx_embeddings_coll ON embeddings(collection_name)
+    ''')
+    # Embedding dimension recorded once per collection, so readers can decode
+    # the raw BLOBs and writers can reject mismatched vectors
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS collections (
+        name TEXT PRIMARY KEY,
+        dim INTEGER NOT NULL
+    )
+    ''')
     conn.commit()
     conn.close()
 
 init_db()
 
-import pickle  # For serializing embeddings
+# Quantize an embedding to int8 with a symmetric per-vector scale
+def quantize_int8(embedding):
+    """
+    Quantizes an FP32 embedding to int8 bytes with a symmetric per-vector scale.
+
+    Args:
+        embedding (List[float]): The embedding to quantize.
+
+    Returns:
+        Tuple[bytes, float]: The int8-quantized vector as raw bytes and its scale.
+    """
+    v = np.asarray(embedding, dtype=np.float32)
+    scale = float(np.max(np.abs(v))) / 127 or 1.0
+    q = np.round(v / scale).astype(np.int8)
+    return q.tobytes(), scale
+
+# Dequantize int8 bytes back to an FP32 vector
+def dequantize_int8(blob, scale):
+    """
+    Restores an FP32 embedding from int8 bytes and its scale.
+
+    Args:
+        blob (bytes): The int8-quantized vector bytes.
+        scale (float): The per-vector scale used at quantization time.
+
+    Returns:
+        np.ndarray: The dequantized FP32 embedding.
+    """
+    # frombuffer avoids a copy of the BLOB on read
+    return np.frombuffer(blob, dtype=np.int8).astype(np.float32) * scale
 
 def sqlite_vector_store(embeddings, paragraphs, collection_name):
     """
     Stores embeddings in an SQLite database.
 
+    Embeddings are quantized to int8 before storage, cutting row size and
+    query-time bandwidth 4x compared to pickled FP32 vectors.
+
     Args:
         embeddings (List): List of embeddings to store.
         paragraphs (List[str]): List of text paragraphs corresponding to the embeddings.
         collection_name (str): Name of the collection in the SQLite database.
     """
     try:
-        conn = sqlite3.connect('embeddings.db')
-        c = conn.cursor()
-
-        # Add embeddings to the database
-        for doc_id, (embedding, paragraph) in enumerate(zip(embeddings, paragraphs)):
-            # Serialize embedding
-            serialized_embedding = pickle.dumps(embedding)
-            c.execute('''
-                INSERT INTO embeddings (collection_name, doc_id, embedding, paragraph)
-                VALUES (?, ?, ?, ?)
-            ''', (collection_name, doc_id, serialized_embedding, paragraph))
-
-        conn.commit()
+        if not embeddings:
+            return
+
+        conn = _connect()
+
+        # Register the collection's dimension once and reject mismatched vectors
+        dim = len(embeddings[0])
+        with conn:
+            conn.execute('INSERT OR IGNORE INTO collections (name, dim) VALUES (?, ?)',
+                         (collection_name, dim))
+        stored_dim = conn.execute('SELECT dim FROM collections WHERE name = ?',
+                                  (collection_name,)).fetchone()[0]
+        if stored_dim != dim:
+            conn.close()
+            print(f"Error storing embeddings in SQLite: dimension mismatch for "
+                  f"{collection_name} (expected {stored_dim}, got {dim})")
+            return
+
+        # Quantize lazily and insert every row in one statement + one transaction,
+        # avoiding per-row SQL parse and WAL fsync overhead
+        rows = (
+            (collection_name, doc_id) + quantize_int8(embedding) + (paragraph,)
+            for doc_id, (embedding, paragraph) in enumerate(zip(embeddings, paragraphs))
+        )
+        with conn:
+            conn.executemany('''
+                INSERT INTO embeddings (collection_name, doc_id, embedding, scale, paragraph)
+                VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+
         conn.close()
         print("Stored embeddings in SQLite database")
     except Exception as e:
@@ -58,15 +135,20 @@ def delete_from_sqlite(collection_name):
     collection_name (str): The name of the collection to delete.
     """
     try:
-        conn = sqlite3.connect('embeddings.db')
-        c = conn.cursor()
-        
-        # Delete the embeddings for the collection
-        c.execute('''
-            DELETE FROM embeddings WHERE collection_name = ?
-        ''', (collection_name,))
-        
-        conn.commit()
+        # _connect sets synchronous=NORMAL and the idx_embeddings_coll index
+        # from init_db turns the delete into an index seek rather than a scan
+        conn = _connect()
+
+        # Delete the embeddings and the collection's dimension record in one
+        # transaction
+        with conn:
+            conn.execute('''
+                DELETE FROM embeddings WHERE collection_name = ?
+            ''', (collection_name,))
+            conn.execute('''
+                DELETE FROM collections WHERE name = ?
+            ''', (collection_name,))
+
         conn.close()
         print(f"Collection {collection_name} deleted from SQLite database")
     except Exception as e:
@@ -173,10 +173,22 @@ if prompt:
         response = requests.post("http://127.0.0.1:8000/ask-question/", json=data, stream=True)
 
         if response.status_code == 200:
+            # The backend streams Server-Sent Events frames (b"data: ...\n\n");
+            # buffer bytes, split out complete frames and strip the framing.
+            # Payload newlines arrive as extra "data: " lines within a frame,
+            # so the lines are rejoined with "\n" to restore paragraph breaks
+            sse_buffer = b""
             for chunk in response.iter_content(chunk_size=1024):
                 if chunk:
-                    response_text += chunk.decode('utf-8')
-                    message_placeholder.markdown(response_text)
+                    sse_buffer += chunk
+                    while (frame_end := sse_buffer.find(b"\n\n")) != -1:
+                        frame = sse_buffer[:frame_end]
+                        sse_buffer = sse_buffer[frame_end + 2:]
+                        payload = b"\n".join(
+                            line[len(b"data: "):] if line.startswith(b"data: ") else line
+                            for line in frame.split(b"\n"))
+                        response_text += payload.decode('utf-8')
+                        message_placeholder.markdown(response_text)
             
             # Append the full response to chat history
             st.session_state['chat_history'].append({